@@ -0,0 +1,17 @@
+"""
+Shared pytest fixtures for the research assistant tests.
+"""
+
+import os
+
+# Keep checkpoints in memory - importing research_assistant opens the
+# checkpoint database, which would otherwise create research_memory.db
+os.environ["RESEARCH_MEMORY_DB"] = ":memory:"
+
+import pytest
+
+@pytest.fixture(scope="session")
+def app():
+    """The compiled research graph, imported once per test session."""
+    from research_assistant import app
+    return app
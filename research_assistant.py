@@ -2,18 +2,37 @@
 Advanced Research Assistant using LangGraph with custom state, memory, and human-in-the-loop.
 """
 
+import ast
+import asyncio
+import math
+import operator
 import os
-from typing import Annotated, List, Optional, Literal
+import re
+import sqlite3
+import statistics
+import uuid
+import zlib
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import Annotated, AsyncIterator, List, Optional, Literal, Union
+import aiosqlite
 from dotenv import load_dotenv
 
-from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, SystemMessage
+from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, SystemMessage, ToolMessage
 from langchain_anthropic import ChatAnthropic
+from langchain_core.caches import InMemoryCache
+from langchain_core.globals import set_llm_cache
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.runnables import RunnableConfig
 from langchain_core.tools import tool
 from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import add_messages
-from langgraph.prebuilt import ToolNode, tools_condition
+from langgraph.prebuilt import tools_condition
 from langgraph.checkpoint.sqlite import SqliteSaver
-from langgraph.types import Command, interrupt
+from langgraph.errors import GraphBubbleUp
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+from langgraph.types import Command, Overwrite, interrupt
 from typing_extensions import TypedDict
 
 load_dotenv()
@@ -24,49 +43,147 @@ class ResearchState(TypedDict):
     
     # Custom state fields for research tracking
     research_query: Optional[str]
-    research_progress: Optional[List[str]]
-    sources_found: Optional[List[str]]
+    # Nodes return only new entries; the reducer appends them. Each new query
+    # resets both lists with Overwrite, so they never span queries on a thread.
+    research_progress: Annotated[List[str], operator.add]
+    sources_found: Annotated[List[str], operator.add]
     requires_approval: Optional[bool]
     approved_by_human: Optional[bool]
     summary: Optional[str]
 
+# Mock search results and internal documents
+SEARCH_RESULTS = {
+    "climate change": "Recent studies show global temperatures rising 1.1°C since pre-industrial times...",
+    "ai research": "Latest breakthroughs in transformer models and multimodal AI systems...", 
+    "quantum computing": "IBM and Google achieve quantum supremacy with 1000+ qubit systems...",
+    "space exploration": "NASA's Artemis program targets moon landing by 2026..."
+}
+
+DOCUMENTS = {
+    "DOC-001": "Internal research on renewable energy shows 40% efficiency gains...",
+    "DOC-002": "Market analysis indicates strong growth in AI sector...",
+    "DOC-003": "Technical specifications for quantum encryption protocols..."
+}
+
+# One compiled alternation over all keywords, so a query is scanned once
+SEARCH_PATTERN = re.compile("|".join(map(re.escape, SEARCH_RESULTS)))
+
+# Largest ndigits round() accepts. int.__round__ builds 10**-ndigits in C,
+# where the MAX_INT_BITS check below never sees it.
+MAX_ROUND_DIGITS = 20
+
+def _round(number, ndigits=None):
+    """round() with ndigits bounded by MAX_ROUND_DIGITS."""
+    if ndigits is not None and abs(ndigits) > MAX_ROUND_DIGITS:
+        raise ValueError(f"round() ndigits must be within +/-{MAX_ROUND_DIGITS}")
+    return round(number, ndigits)
+
+# Names calculate_stats expressions may use - everything else is rejected
+SAFE_NAMES = {
+    "abs": abs, "round": _round, "min": min, "max": max, "sum": sum,
+    "sqrt": math.sqrt, "log": math.log, "exp": math.exp, "pi": math.pi, "e": math.e,
+    "mean": statistics.mean, "median": statistics.median, "stdev": statistics.stdev,
+}
+BINARY_OPS = {
+    ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul,
+    ast.Div: operator.truediv, ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod, ast.Pow: operator.pow,
+}
+UNARY_OPS = {ast.UAdd: operator.pos, ast.USub: operator.neg}
+SAFE_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, *BINARY_OPS, *UNARY_OPS,
+    ast.Constant, ast.Name, ast.Load, ast.Call, ast.List, ast.Tuple,
+)
+# Expressions come from the LLM, so cap integer size - otherwise something
+# like 9**9**9 ties up the process computing a number nobody asked for
+MAX_INT_BITS = 4096
+
+@lru_cache(maxsize=1024)
+def _parse_expression(expression: str) -> ast.Expression:
+    """Parse an arithmetic expression, rejecting any other syntax."""
+    tree = ast.parse(expression, mode="eval")
+    for node in ast.walk(tree):
+        if not isinstance(node, SAFE_NODES):
+            raise ValueError(f"unsupported syntax '{type(node).__name__}'")
+        if isinstance(node, ast.Name) and node.id not in SAFE_NAMES:
+            raise ValueError(f"unknown name '{node.id}'")
+        if isinstance(node, ast.Constant) and not isinstance(node.value, (int, float, complex)):
+            raise ValueError(f"unsupported constant {node.value!r}")
+    return tree
+
+def _number(value):
+    """Return value if it is a number - sequences only go into function calls."""
+    if not isinstance(value, (int, float, complex)):
+        raise ValueError(f"arithmetic on {type(value).__name__} is not supported")
+    return value
+
+def _evaluate(node: ast.AST):
+    """Evaluate a tree from _parse_expression with bounded integer sizes."""
+    if isinstance(node, ast.Expression):
+        return _evaluate(node.body)
+    if isinstance(node, ast.Constant):
+        return node.value
+    if isinstance(node, ast.Name):
+        return SAFE_NAMES[node.id]
+    if isinstance(node, (ast.List, ast.Tuple)):
+        return [_evaluate(element) for element in node.elts]
+    if isinstance(node, ast.Call):
+        return _evaluate(node.func)(*(_evaluate(arg) for arg in node.args))
+    if isinstance(node, ast.UnaryOp):
+        return UNARY_OPS[type(node.op)](_number(_evaluate(node.operand)))
+
+    left, right = _number(_evaluate(node.left)), _number(_evaluate(node.right))
+    if (
+        isinstance(node.op, ast.Pow)
+        and isinstance(left, int) and isinstance(right, int)
+        and left.bit_length() * right > MAX_INT_BITS
+    ):
+        raise ValueError("result is too large")
+    result = BINARY_OPS[type(node.op)](left, right)
+    if isinstance(result, int) and result.bit_length() > MAX_INT_BITS:
+        raise ValueError("result is too large")
+    return result
+
+# The mock tools are pure functions of their argument, so repeat calls are
+# served from memory. Set CACHE_TOOL_RESULTS=0 to always recompute.
+CACHE_TOOL_RESULTS = os.getenv("CACHE_TOOL_RESULTS", "1") != "0"
+cache_tool_result = lru_cache(maxsize=512) if CACHE_TOOL_RESULTS else (lambda func: func)
+
+@cache_tool_result
+def _web_search(query: str) -> str:
+    match = SEARCH_PATTERN.search(query.lower())
+    if match:
+        return f"Search results for '{query}':\n{SEARCH_RESULTS[match.group()]}"
+    
+    return f"No specific results found for '{query}'. General information available."
+
+@cache_tool_result
+def _document_lookup(document_id: str) -> str:
+    return DOCUMENTS.get(document_id, f"Document {document_id} not found in database")
+
+@cache_tool_result
+def _calculate_stats(expression: str) -> str:
+    try:
+        result = _evaluate(_parse_expression(expression))
+        return f"Calculation result: {expression} = {result}"
+    except Exception as e:
+        return f"Error in calculation: {str(e)}"
+
 # Research tools
 @tool
 def web_search(query: str) -> str:
     """Search the web for information."""
-    # Mock search results
-    search_results = {
-        "climate change": "Recent studies show global temperatures rising 1.1°C since pre-industrial times...",
-        "ai research": "Latest breakthroughs in transformer models and multimodal AI systems...", 
-        "quantum computing": "IBM and Google achieve quantum supremacy with 1000+ qubit systems...",
-        "space exploration": "NASA's Artemis program targets moon landing by 2026..."
-    }
-    
-    for keyword in search_results:
-        if keyword in query.lower():
-            return f"Search results for '{query}':\n{search_results[keyword]}"
-    
-    return f"No specific results found for '{query}'. General information available."
+    return _web_search(query)
 
 @tool
 def document_lookup(document_id: str) -> str:
     """Look up information from internal documents."""
-    docs = {
-        "DOC-001": "Internal research on renewable energy shows 40% efficiency gains...",
-        "DOC-002": "Market analysis indicates strong growth in AI sector...",
-        "DOC-003": "Technical specifications for quantum encryption protocols..."
-    }
-    return docs.get(document_id, f"Document {document_id} not found in database")
+    return _document_lookup(document_id)
 
 @tool
 def calculate_stats(expression: str) -> str:
     """Perform calculations and statistical analysis."""
-    try:
-        # Simple calculator (in real implementation, would use proper math library)
-        result = eval(expression)  # Note: eval is unsafe in production
-        return f"Calculation result: {expression} = {result}"
-    except Exception as e:
-        return f"Error in calculation: {str(e)}"
+    return _calculate_stats(expression)
 
 @tool
 def request_human_approval(topic: str) -> str:
@@ -80,71 +197,127 @@ def request_human_approval(topic: str) -> str:
 
 # Define tools list
 tools = [web_search, document_lookup, calculate_stats, request_human_approval]
+tools_by_name = {t.name: t for t in tools}
+
+# Tools that pause the graph for a human decision
+APPROVAL_TOOLS: frozenset[str] = frozenset({"request_human_approval"})
+
+def _approval_granted(output) -> bool:
+    """Whether an approval tool's output records a granted approval."""
+    return isinstance(output, str) and output.startswith("Human approval granted")
+
+# Cache LLM responses so repeated queries skip the API round trip.
+# Keys cover the model params, bound tool schemas and serialized messages,
+# which grow with the history - bound the entry count so memory stays flat.
+LLM_CACHE_SIZE = 256
+set_llm_cache(InMemoryCache(maxsize=LLM_CACHE_SIZE))
 
 # Initialize LLM with tools
 llm = ChatAnthropic(model="claude-3-haiku-20240307")
 llm_with_tools = llm.bind_tools(tools)
 
-def run_agent(state: ResearchState):
-    """Run the research agent with current state."""
-    system_prompt = """You are an advanced research assistant. You can:
+# Built once: the prompt is static, and progress and sources are already
+# visible to the model through the message history
+SYSTEM_MESSAGE = SystemMessage(content="""You are an advanced research assistant. You can:
     1. Search the web for information
     2. Look up internal documents  
     3. Perform calculations and analysis
     4. Request human approval for sensitive topics
     
-    Current research progress: {progress}
-    Sources found: {sources}
-    
     Be thorough and helpful. For sensitive topics like politics, controversies, 
     or personal information, use the request_human_approval tool first.
-    """
-    
-    # Add system message with context
-    messages = state["messages"].copy()
-    if not any(isinstance(msg, SystemMessage) for msg in messages):
-        progress = state.get("research_progress", [])
-        sources = state.get("sources_found", [])
-        system_msg = SystemMessage(content=system_prompt.format(
-            progress=progress, sources=sources
-        ))
-        messages.insert(0, system_msg)
+
+    When you need several independent lookups (web_search, document_lookup,
+    calculate_stats), request them all as parallel tool calls in a single
+    response instead of one per turn.
+    """)
+
+async def run_agent(state: ResearchState):
+    """Run the research agent with current state."""
+    # Prepend the shared system message unless the history already starts with one
+    messages = state["messages"]
+    if not (messages and isinstance(messages[0], SystemMessage)):
+        messages = [SYSTEM_MESSAGE, *messages]
     
     # Get response from LLM
-    response = llm_with_tools.invoke(messages)
+    response = await llm_with_tools.ainvoke(messages)
     
     # Update state with response and research tracking
     return {
         "messages": [response],
         "research_query": state.get("research_query") or "General research",
-        "research_progress": state.get("research_progress", []) + ["Agent response generated"],
+        "research_progress": ["Agent response generated"],
     }
 
+async def _call_tool(tool_call: dict, config: RunnableConfig):
+    """Invoke a single tool call by name."""
+    return await tools_by_name[tool_call["name"]].ainvoke(tool_call["args"], config)
+
+def _to_tool_message(tool_call: dict, output) -> ToolMessage:
+    """Wrap a tool result (or the exception it raised) in a ToolMessage."""
+    if isinstance(output, Exception):
+        return ToolMessage(
+            content=f"Error: {output!r}\n Please fix your mistakes.",
+            name=tool_call["name"],
+            tool_call_id=tool_call["id"],
+            status="error",
+        )
+    return ToolMessage(content=str(output), name=tool_call["name"], tool_call_id=tool_call["id"])
+
+async def parallel_tool_node(state: ResearchState, config: RunnableConfig):
+    """Execute all tool calls from the last message concurrently."""
+    tool_calls = getattr(state["messages"][-1], "tool_calls", None) or []
+    outputs = [None] * len(tool_calls)
+
+    # Approval calls interrupt the graph, so run them one at a time before
+    # anything else - gather(return_exceptions=True) would swallow the interrupt.
+    # If approval was granted up front, answer them without pausing at all.
+    pending = []
+    denied = False
+    for i, tool_call in enumerate(tool_calls):
+        if tool_call["name"] in APPROVAL_TOOLS and state.get("approved_by_human"):
+            outputs[i] = "Human approval was granted before this research started."
+        elif tool_call["name"] in APPROVAL_TOOLS:
+            try:
+                outputs[i] = await _call_tool(tool_call, config)
+            except GraphBubbleUp:
+                raise
+            except Exception as e:
+                outputs[i] = e
+            denied = denied or not _approval_granted(outputs[i])
+        else:
+            pending.append(i)
+
+    # The other calls in the turn may be the sensitive lookups themselves, so
+    # a denied (or failed) approval answers them without running any
+    if denied:
+        for i in pending:
+            outputs[i] = PermissionError("skipped: human approval denied")
+        pending = []
+
+    # Everything else is independent I/O - fan out and wait for all of it
+    results = await asyncio.gather(
+        *(_call_tool(tool_calls[i], config) for i in pending), return_exceptions=True
+    )
+    for i, result in zip(pending, results):
+        outputs[i] = result
+
+    # Keep the original tool_call order so results line up with the requests
+    return {"messages": [_to_tool_message(tc, out) for tc, out in zip(tool_calls, outputs)]}
+
 def route_after_agent(state: ResearchState) -> Literal["tools", "approval", "summarize"]:
     """Route after agent based on the last message."""
-    last_message = state["messages"][-1]
+    tool_calls = getattr(state["messages"][-1], "tool_calls", None)
     
-    # Handle case where no tool calls are made
-    if not hasattr(last_message, 'tool_calls') or not last_message.tool_calls:
-        # Check if we have enough research to summarize
-        progress = state.get("research_progress", [])
-        if len(progress) > 3:  # Arbitrary threshold for summarization
-            return "summarize"
-        else:
-            return "tools"  # Default to tools if no clear direction
-    
-    # Check if there are tool calls
-    if last_message.tool_calls:
-        # Check if any tool call is for human approval
-        for tool_call in last_message.tool_calls:
-            if tool_call["name"] == "request_human_approval":
-                return "approval"
+    # Any approval request takes priority over the other tool calls
+    if tool_calls:
+        if any(tool_call["name"] in APPROVAL_TOOLS for tool_call in tool_calls):
+            return "approval"
         return "tools"
     
-    # No tool calls, check if we should summarize
-    if last_message.content and ("summary" in last_message.content.lower() or "conclude" in last_message.content.lower()):
+    # No tool calls - summarize once there's enough research, otherwise default to tools
+    if len(state.get("research_progress") or ()) > 3:  # Arbitrary threshold for summarization
         return "summarize"
-    
     return "tools"
 
 def request_approval(state: ResearchState):
@@ -152,34 +325,40 @@ def request_approval(state: ResearchState):
     # The interrupt happens in the tool, this node just updates state
     return {
         "requires_approval": True,
-        "research_progress": state.get("research_progress", []) + ["Approval requested"]
+        "research_progress": ["Approval requested"]
     }
 
-def summarize_research(state: ResearchState):
-    """Generate a final research summary."""
-    messages = state["messages"]
-    
-    # Create summary prompt
-    summary_prompt = f"""
+# Summary prompt is parsed once; the conversation is slotted in ahead of the request
+SUMMARY_PROMPT = ChatPromptTemplate.from_messages([
+    MessagesPlaceholder("messages"),
+    ("human", """
     Based on the research conversation above, provide a comprehensive summary including:
-    1. Main research query: {state.get('research_query', 'Not specified')}
+    1. Main research query: {query}
     2. Key findings from sources
     3. Important data points or calculations
     4. Conclusions and recommendations
     
-    Research progress: {state.get('research_progress', [])}
-    Sources consulted: {state.get('sources_found', [])}
+    Research progress: {progress}
+    Sources consulted: {sources}
     
     Provide a well-structured summary.
-    """
-    
-    summary_message = HumanMessage(content=summary_prompt)
-    summary_response = llm.invoke(messages + [summary_message])
+    """),
+])
+summary_chain = SUMMARY_PROMPT | llm
+
+async def summarize_research(state: ResearchState):
+    """Generate a final research summary."""
+    summary_response = await summary_chain.ainvoke({
+        "messages": state["messages"],
+        "query": state.get("research_query") or "Not specified",
+        "progress": " -> ".join(state.get("research_progress") or ()),
+        "sources": ", ".join(state.get("sources_found") or ()) or "None",
+    })
     
     return {
         "messages": [summary_response], 
         "summary": summary_response.content,
-        "research_progress": state.get("research_progress", []) + ["Research summarized"]
+        "research_progress": ["Research summarized"]
     }
 
 # Create the workflow
@@ -187,7 +366,7 @@ workflow = StateGraph(ResearchState)
 
 # Add nodes
 workflow.add_node("agent", run_agent)
-workflow.add_node("tools", ToolNode(tools))
+workflow.add_node("tools", parallel_tool_node)
 workflow.add_node("approval", request_approval)
 workflow.add_node("summarize", summarize_research)
 
@@ -204,80 +383,220 @@ workflow.add_conditional_edges(
     }
 )
 
-# Add edges back to agent
+# Add edges back to agent - approval goes through tools so the approval tool runs
 workflow.add_edge("tools", "agent")
-workflow.add_edge("approval", "agent")
+workflow.add_edge("approval", "tools")
 workflow.add_edge("summarize", END)
 
 # Setup memory with SQLite
-checkpointer = SqliteSaver.from_conn_string(":memory:")  # Use in-memory for demo, change to "research_memory.db" for persistence
+# File-backed so sessions survive restarts; set RESEARCH_MEMORY_DB=":memory:" for a throwaway run.
+# WAL lets readers proceed while a checkpoint is being written, and SqliteSaver
+# serializes its own writes, so the connection can be shared across threads.
+CHECKPOINT_DB = os.getenv("RESEARCH_MEMORY_DB", "research_memory.db")
+
+# A checkpoint is written after every node, so trade per-commit fsync for WAL
+# with NORMAL syncing and give SQLite a 64 MiB page cache
+SQLITE_PRAGMAS = """
+PRAGMA journal_mode=WAL;
+PRAGMA synchronous=NORMAL;
+PRAGMA temp_store=MEMORY;
+PRAGMA mmap_size=1073741824;
+PRAGMA cache_size=-65536;
+PRAGMA wal_autocheckpoint=1000;
+"""
+
+def connect_checkpoint_db(path: str = CHECKPOINT_DB) -> sqlite3.Connection:
+    """Open the checkpoint database with write-tuned pragmas."""
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.executescript(SQLITE_PRAGMAS)
+    if path == ":memory:":
+        # Nothing outside this connection can see an in-memory database
+        conn.execute("PRAGMA locking_mode=EXCLUSIVE")
+    return conn
+
+class CompressedSerializer(JsonPlusSerializer):
+    """JsonPlusSerializer that zlib-compresses larger checkpoint payloads.
+
+    Each checkpoint re-serializes the whole message history, which is mostly
+    repetitive text, so compressing shrinks both the write and the database.
+    Compressed payloads get a "+zlib" type suffix; anything without it is
+    loaded as-is, so existing checkpoints keep working.
+    """
+
+    min_size = 256  # Smaller payloads aren't worth the compression overhead
+
+    def dumps_typed(self, obj):
+        type_, data = super().dumps_typed(obj)
+        if len(data) < self.min_size:
+            return type_, data
+        return f"{type_}+zlib", zlib.compress(data, 1)
+
+    def loads_typed(self, data):
+        type_, data_ = data
+        if type_.endswith("+zlib"):
+            return super().loads_typed((type_.removesuffix("+zlib"), zlib.decompress(data_)))
+        return super().loads_typed(data)
 
+checkpoint_serde = CompressedSerializer()
+checkpointer = SqliteSaver(connect_checkpoint_db(), serde=checkpoint_serde)
+
+# The nodes are async, so this graph is for synchronous state inspection
+# (get_state, get_state_history) of a file-backed CHECKPOINT_DB; runs go
+# through open_app(). With ":memory:" each connection is its own database, so
+# this graph sees none of the threads open_app() writes.
 app = workflow.compile(checkpointer=checkpointer)
 
-def main():
+@asynccontextmanager
+async def open_app(path: str = CHECKPOINT_DB) -> AsyncIterator:
+    """Compile the workflow against an async SQLite checkpointer."""
+    async with aiosqlite.connect(path) as conn:
+        await conn.executescript(SQLITE_PRAGMAS)
+        yield workflow.compile(checkpointer=AsyncSqliteSaver(conn, serde=checkpoint_serde))
+
+# Upper bound on graph steps per run. The agent <-> tools loop has no natural
+# end, and LangGraph's own default limit is effectively unbounded.
+MAX_GRAPH_STEPS = 25
+
+# Fields every new query starts with. The list fields are built per query:
+# fresh lists can't leak between inputs, and Overwrite clears what earlier
+# queries on the same thread appended.
+BASE_INPUT = {
+    "requires_approval": False,
+    "approved_by_human": False,
+    "summary": None
+}
+
+def _initial_input(user_input: str) -> dict:
+    """Initialize state with all custom fields for a new research query."""
+    return {
+        **BASE_INPUT,
+        "messages": [HumanMessage(content=user_input)],
+        "research_query": user_input,
+        "research_progress": Overwrite(["Research started"]),
+        "sources_found": Overwrite([]),
+    }
+
+# Queries a batch runs at once, to stay under the LLM provider's rate limits
+BATCH_MAX_CONCURRENCY = 4
+
+async def run_batch(queries: List[str], pre_approved: bool = False) -> List[Union[dict, Exception]]:
+    """Research several queries concurrently, each in its own thread.
+
+    With pre_approved=True, sensitive topics proceed without pausing for an
+    approval interrupt, so unattended batches run to completion. A query that
+    fails yields its exception in place of a result, without failing the batch.
+    """
+    batch_id = uuid.uuid4().hex[:8]
+    inputs = [{**_initial_input(query), "approved_by_human": pre_approved} for query in queries]
+    configs = [
+        {
+            "configurable": {"thread_id": f"batch-{batch_id}-{i}"},
+            "recursion_limit": MAX_GRAPH_STEPS,
+            "max_concurrency": BATCH_MAX_CONCURRENCY,
+        }
+        for i in range(len(queries))
+    ]
+    async with open_app() as graph:
+        return await graph.abatch(inputs, config=configs, return_exceptions=True)
+
+def _message_text(message: BaseMessage) -> str:
+    """Return the text of a message whose content may be a list of blocks."""
+    if isinstance(message.content, str):
+        return message.content
+    return "".join(
+        block if isinstance(block, str) else block.get("text", "")
+        for block in message.content
+        if isinstance(block, str) or block.get("type") == "text"
+    )
+
+# Token chunks for display, plus per-node updates - the small diffs that
+# carry interrupts - instead of full state snapshots
+STREAM_MODES = ["messages", "updates"]
+
+# Nodes whose LLM tokens are shown to the user
+LLM_NODES = frozenset({"agent", "summarize"})
+
+async def _print_stream(events) -> tuple:
+    """Print LLM tokens from a STREAM_MODES stream as they arrive.
+
+    Returns the interrupts the run stopped on, if any.
+    """
+    current_id = None
+    interrupts = ()
+    async for mode, payload in events:
+        if mode == "updates":
+            interrupts = payload.get("__interrupt__", interrupts)
+            continue
+        chunk, metadata = payload
+        if (
+            not isinstance(chunk, AIMessage)
+            or metadata.get("langgraph_node") not in LLM_NODES
+            or not (text := _message_text(chunk))
+        ):
+            continue
+        if chunk.id != current_id:
+            current_id = chunk.id
+            print("\nAssistant: ", end="")
+        print(text, end="", flush=True)
+    print()
+    return interrupts
+
+async def main():
     """Run the research assistant."""
     print("🔬 Advanced Research Assistant Started!")
     print("Ask me to research any topic. I can search, analyze, and summarize.")
     print("Type 'quit' to exit.")
     print("-" * 60)
     
-    thread_config = {"configurable": {"thread_id": "research-session-1"}}
+    thread_config = {"configurable": {"thread_id": "research-session-1"}, "recursion_limit": MAX_GRAPH_STEPS}
     
-    while True:
-        user_input = input("\nResearcher: ")
-        if user_input.lower() == 'quit':
-            break
-
-        user_message = HumanMessage(content=user_input)
-        # Initialize state with all custom fields
-        initial_input = {
-            "messages": [user_message],
-            "research_query": user_input,
-            "research_progress": ["Research started"],
-            "sources_found": [],
-            "requires_approval": False,
-            "approved_by_human": False,
-            "summary": None
-        }
+    async with open_app() as graph:
+        while True:
+            # Read input off the event loop thread so it stays responsive
+            user_input = await asyncio.to_thread(input, "\nResearcher: ")
+            if user_input.lower() == 'quit':
+                break
 
-        # Stream events and handle interrupts properly
-        events = app.stream(initial_input, config=thread_config, stream_mode="values")
-        
-        try:
-            for event in events:
-                if "messages" in event and event["messages"]:
-                    last_message = event["messages"][-1]
-                    if hasattr(last_message, 'content') and last_message.content:
-                        print(f"Assistant: {last_message.content}")
-        except Exception as e:
-            if "interrupt" in str(e).lower():
-                print("\n⏸️  Sensitive topic detected. Requires human approval to proceed.")
-                while True:
-                    approval_input = input("Type 'approve' to continue or 'reject' to stop: ").lower()
-                    if approval_input == 'approve':
-                        print("✅ Approval granted. Resuming research...")
-                        # Resume with Command pattern
-                        resume_command = Command(resume={"approved": True})
-                        try:
-                            for event in app.stream(resume_command, config=thread_config, stream_mode="values"):
-                                if "messages" in event and event["messages"]:
-                                    last_message = event["messages"][-1]
-                                    if hasattr(last_message, 'content') and last_message.content:
-                                        print(f"Assistant: {last_message.content}")
-                        except Exception as resume_error:
-                            print(f"Error during resume: {resume_error}")
-                        break
-                    elif approval_input == 'reject':
-                        print("❌ Research rejected. Please enter a new query.")
-                        break
-                    else:
-                        print("Please type 'approve' or 'reject'")
-            else:
+            # Stream tokens and handle interrupts properly
+            events = graph.astream(_initial_input(user_input), config=thread_config, stream_mode=STREAM_MODES)
+            
+            try:
+                # interrupt() doesn't raise out of the stream - the run just stops
+                # and reports the interrupt as an update
+                interrupts = await _print_stream(events)
+            except Exception as e:
                 print(f"Error occurred: {e}")
+                continue
+
+            # A resumed run can pause again - another approval call in the same
+            # turn, or a later turn asking again - so keep going until it doesn't
+            while interrupts:
+                print("\n⏸️  Sensitive topic detected. Requires human approval to proceed.")
+                approval_input = (await asyncio.to_thread(
+                    input, "Type 'approve' to continue or 'reject' to stop: "
+                )).lower()
+                if approval_input not in ('approve', 'reject'):
+                    print("Please type 'approve' or 'reject'")
+                    continue
+                approved = approval_input == 'approve'
+                if approved:
+                    print("✅ Approval granted. Resuming research...")
+                else:
+                    print("❌ Research rejected. Finishing without the sensitive topic...")
+                # Resume either way: the approval tool call needs its ToolMessage,
+                # or the next query sends the model an unanswered tool_use
+                resume_command = Command(resume={"approved": approved})
+                try:
+                    interrupts = await _print_stream(
+                        graph.astream(resume_command, config=thread_config, stream_mode=STREAM_MODES)
+                    )
+                except Exception as resume_error:
+                    print(f"Error during resume: {resume_error}")
+                    break
 
 if __name__ == "__main__":
     try:
-        main()
+        asyncio.run(main())
     except KeyboardInterrupt:
         print("\n👋 Research assistant stopped.")
     except Exception as e:
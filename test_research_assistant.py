@@ -0,0 +1,300 @@
+"""
+Tests for the research assistant's graph nodes, driven by a fake chat model.
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeMessagesListChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+from langchain_core.tools import tool
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from langgraph.types import Command
+
+import research_assistant as ra
+
+def _tool_call(name, call_id, **args):
+    return {"name": name, "args": args, "id": call_id, "type": "tool_call"}
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    """Replace the agent and summary LLMs with a scripted fake model."""
+    def install(*responses):
+        # cache=False keeps scripted replies out of the process-wide LLM cache
+        fake = FakeMessagesListChatModel(responses=list(responses), cache=False)
+        monkeypatch.setattr(ra, "llm_with_tools", fake)
+        monkeypatch.setattr(ra, "summary_chain", ra.SUMMARY_PROMPT | fake)
+        return fake
+    return install
+
+def test_tool_node_keeps_tool_call_order():
+    """Results come back in tool_call order, errors as error ToolMessages."""
+    message = AIMessage(content="", tool_calls=[
+        _tool_call("web_search", "a", query="AI research"),
+        _tool_call("no_such_tool", "b"),
+        _tool_call("document_lookup", "c", document_id="DOC-001"),
+    ])
+    result = asyncio.run(ra.parallel_tool_node({"messages": [message]}, {}))
+
+    tool_messages = result["messages"]
+    assert [m.tool_call_id for m in tool_messages] == ["a", "b", "c"]
+    assert [m.status for m in tool_messages] == ["success", "error", "success"]
+    assert "KeyError" in tool_messages[1].content
+    assert tool_messages[2].content.startswith("Internal research on renewable energy")
+
+def test_tool_node_wraps_approval_tool_errors(monkeypatch):
+    """A failing approval tool reports an error and skips the other calls."""
+    @tool("request_human_approval")
+    def failing_approval(topic: str) -> str:
+        """Request human approval for sensitive research topics."""
+        raise ValueError("approval service down")
+
+    monkeypatch.setitem(ra.tools_by_name, "request_human_approval", failing_approval)
+    message = AIMessage(content="", tool_calls=[
+        _tool_call("request_human_approval", "a", topic="politics"),
+        _tool_call("web_search", "b", query="climate change"),
+    ])
+    result = asyncio.run(ra.parallel_tool_node({"messages": [message]}, {}))
+
+    approval, search = result["messages"]
+    assert approval.status == "error" and "approval service down" in approval.content
+    assert search.status == "error" and "skipped: human approval denied" in search.content
+
+def test_approval_interrupts_then_resumes(fake_llm):
+    """The approval tool pauses the run; resuming answers every tool call in order."""
+    fake_llm(
+        AIMessage(content="", tool_calls=[
+            _tool_call("request_human_approval", "a", topic="politics"),
+            _tool_call("web_search", "b", query="AI research"),
+        ]),
+        AIMessage(content="Research complete."),
+        AIMessage(content="Summary."),
+    )
+    graph = ra.workflow.compile(checkpointer=MemorySaver())
+    config = {"configurable": {"thread_id": "approval"}}
+
+    async def run():
+        await graph.ainvoke(ra._initial_input("politics"), config)
+        paused = await graph.aget_state(config)
+        await graph.ainvoke(Command(resume={"approved": True}), config)
+        return paused, await graph.aget_state(config)
+
+    paused, finished = asyncio.run(run())
+
+    assert paused.next == ("tools",)
+    assert paused.interrupts[0].value["topic"] == "politics"
+    tool_messages = [m for m in finished.values["messages"] if m.type == "tool"]
+    assert [m.tool_call_id for m in tool_messages] == ["a", "b"]
+    assert tool_messages[0].content == "Human approval granted for topic: politics"
+    assert finished.values["summary"] == "Summary."
+
+def test_pre_approved_run_skips_the_interrupt(fake_llm, monkeypatch):
+    """With approved_by_human set, approval calls are answered without pausing."""
+    interrupted = []
+    monkeypatch.setattr(ra, "interrupt", lambda value: interrupted.append(value))
+    fake_llm(
+        AIMessage(content="", tool_calls=[_tool_call("request_human_approval", "a", topic="politics")]),
+        AIMessage(content="Research complete."),
+        AIMessage(content="Summary."),
+    )
+    graph = ra.workflow.compile(checkpointer=MemorySaver())
+    config = {"configurable": {"thread_id": "pre-approved"}}
+
+    async def run():
+        await graph.ainvoke({**ra._initial_input("politics"), "approved_by_human": True}, config)
+        return await graph.aget_state(config)
+
+    finished = asyncio.run(run())
+
+    assert interrupted == []
+    assert not finished.next and not finished.interrupts
+    tool_messages = [m for m in finished.values["messages"] if m.type == "tool"]
+    assert [(m.tool_call_id, m.content) for m in tool_messages] == [
+        ("a", "Human approval was granted before this research started."),
+    ]
+    assert finished.values["summary"] == "Summary."
+
+def test_main_prompts_for_every_interrupt(fake_llm, monkeypatch):
+    """The CLI keeps asking while resumed runs pause for more approvals."""
+    fake_llm(
+        AIMessage(content="", tool_calls=[
+            _tool_call("request_human_approval", "a", topic="politics"),
+            _tool_call("request_human_approval", "b", topic="elections"),
+        ]),
+        AIMessage(content="Research complete."),
+        AIMessage(content="Summary."),
+    )
+    graph = ra.workflow.compile(checkpointer=MemorySaver())
+
+    @asynccontextmanager
+    async def open_app():
+        yield graph
+
+    answers = iter(["politics and elections", "approve", "approve", "quit"])
+    monkeypatch.setattr(ra, "open_app", open_app)
+    monkeypatch.setattr("builtins.input", lambda prompt="": next(answers))
+    asyncio.run(ra.main())
+
+    assert next(answers, None) is None
+    finished = graph.get_state({"configurable": {"thread_id": "research-session-1"}})
+    assert not finished.next and not finished.interrupts
+    tool_messages = [m for m in finished.values["messages"] if m.type == "tool"]
+    assert [(m.tool_call_id, m.content) for m in tool_messages] == [
+        ("a", "Human approval granted for topic: politics"),
+        ("b", "Human approval granted for topic: elections"),
+    ]
+
+def test_rejected_approval_answers_the_tool_call(fake_llm):
+    """Rejecting still resumes, so the thread has no unanswered tool call."""
+    fake_llm(
+        AIMessage(content="", tool_calls=[_tool_call("request_human_approval", "a", topic="politics")]),
+        AIMessage(content="Research declined."),
+        AIMessage(content="Summary."),
+    )
+    graph = ra.workflow.compile(checkpointer=MemorySaver())
+    config = {"configurable": {"thread_id": "rejected"}}
+
+    async def run():
+        await graph.ainvoke(ra._initial_input("politics"), config)
+        await graph.ainvoke(Command(resume={"approved": False}), config)
+        return await graph.aget_state(config)
+
+    finished = asyncio.run(run())
+
+    assert not finished.next and not finished.interrupts
+    tool_messages = [m for m in finished.values["messages"] if m.type == "tool"]
+    assert [(m.tool_call_id, m.content) for m in tool_messages] == [
+        ("a", "Human approval denied for topic: politics"),
+    ]
+
+def test_rejected_approval_skips_sibling_tools(fake_llm, monkeypatch):
+    """Lookups requested alongside a denied approval never run."""
+    searched = []
+
+    @tool("web_search")
+    def recording_search(query: str) -> str:
+        """Search the web for information."""
+        searched.append(query)
+        return "results"
+
+    monkeypatch.setitem(ra.tools_by_name, "web_search", recording_search)
+    fake_llm(
+        AIMessage(content="", tool_calls=[
+            _tool_call("request_human_approval", "a", topic="politics"),
+            _tool_call("web_search", "b", query="politician X scandal"),
+        ]),
+        AIMessage(content="Research declined."),
+        AIMessage(content="Summary."),
+    )
+    graph = ra.workflow.compile(checkpointer=MemorySaver())
+    config = {"configurable": {"thread_id": "rejected-siblings"}}
+
+    async def run():
+        await graph.ainvoke(ra._initial_input("politics"), config)
+        await graph.ainvoke(Command(resume={"approved": False}), config)
+        return await graph.aget_state(config)
+
+    finished = asyncio.run(run())
+
+    assert searched == []
+    approval, search = [m for m in finished.values["messages"] if m.type == "tool"]
+    assert approval.content == "Human approval denied for topic: politics"
+    assert search.tool_call_id == "b" and search.status == "error"
+    assert "skipped: human approval denied" in search.content
+
+@pytest.mark.parametrize("expression, expected", [
+    ("2*21", 42),
+    ("2**10 - 1", 1023),
+    ("mean([1, 2, 3]) + sqrt(16)", 6.0),
+    ("round(stdev([1, 2, 3, 4]), 2)", 1.29),
+    ("-3 % 2", 1),
+    ("round(1234.5678, -2)", 1200.0),
+])
+def test_calculate_stats_accepts_arithmetic(expression, expected):
+    assert ra.calculate_stats.invoke({"expression": expression}) == (
+        f"Calculation result: {expression} = {expected}"
+    )
+
+@pytest.mark.parametrize("expression, error", [
+    ("9**9**9", "too large"),
+    ("2**10000", "too large"),
+    ("(2**4000) * (2**4000)", "too large"),
+    ("round(7, -10**9)", "ndigits must be within +/-20"),
+    ("[1] * 10**12", "arithmetic on list"),
+    ("1 << 10**12", "unsupported syntax 'LShift'"),
+    ("__import__('os')", "unknown name '__import__'"),
+    ("(1).__class__", "unsupported syntax 'Attribute'"),
+    ("'a' * 3", "unsupported constant 'a'"),
+    ("sum(x for x in [1])", "unsupported syntax 'GeneratorExp'"),
+    ("1/0", "division by zero"),
+])
+def test_calculate_stats_rejects_unsafe_expressions(expression, error):
+    result = ra.calculate_stats.invoke({"expression": expression})
+    assert result.startswith("Error in calculation:") and error in result
+
+def test_progress_resets_for_each_query(fake_llm):
+    """A follow-up query on the same thread gets a fresh progress trail."""
+    fake_llm(
+        AIMessage(content="", tool_calls=[_tool_call("web_search", "a", query="AI research")]),
+        AIMessage(content="", tool_calls=[_tool_call("web_search", "b", query="AI research")]),
+        AIMessage(content="First answer."),
+        AIMessage(content="Summary."),
+        AIMessage(content="", tool_calls=[_tool_call("web_search", "c", query="climate change")]),
+    )
+    graph = ra.workflow.compile(checkpointer=MemorySaver())
+    config = {"configurable": {"thread_id": "follow-up"}, "recursion_limit": ra.MAX_GRAPH_STEPS}
+
+    async def run():
+        first = await graph.ainvoke(ra._initial_input("AI research"), config)
+        # Stop after the first agent turn to see where the follow-up routes
+        await graph.ainvoke(ra._initial_input("climate change"), config, interrupt_after=["agent"])
+        return first, await graph.aget_state(config)
+
+    first, second = asyncio.run(run())
+
+    assert first["summary"] == "Summary."
+    assert second.values["research_progress"] == ["Research started", "Agent response generated"]
+    assert second.next == ("tools",)
+
+def test_run_batch_returns_failures_in_place(monkeypatch):
+    """A failing query yields its exception without failing the rest of the batch."""
+    async def agent(messages):
+        if "fail" in messages[-1].content:
+            raise RuntimeError("LLM unavailable")
+        return AIMessage(content="Done.")
+
+    monkeypatch.setattr(ra, "llm_with_tools", RunnableLambda(agent))
+    monkeypatch.setattr(ra, "summary_chain", RunnableLambda(lambda _: AIMessage(content="Summary.")))
+    results = asyncio.run(ra.run_batch(["AI research", "please fail"]))
+
+    assert results[0]["summary"] == "Summary."
+    assert isinstance(results[1], RuntimeError)
+
+def test_serializer_compresses_large_payloads():
+    """Payloads of at least min_size are stored zlib-compressed and round-trip."""
+    serde = ra.CompressedSerializer()
+    payload = {"messages": ["renewable energy " * 100]}
+    type_, data = serde.dumps_typed(payload)
+
+    assert type_.endswith("+zlib")
+    assert len(data) < len(JsonPlusSerializer().dumps_typed(payload)[1])
+    assert serde.loads_typed((type_, data)) == payload
+
+def test_serializer_leaves_small_payloads_uncompressed():
+    """Payloads under min_size keep the plain serializer type."""
+    serde = ra.CompressedSerializer()
+    payload = {"research_query": "AI"}
+    type_, data = serde.dumps_typed(payload)
+
+    assert not type_.endswith("+zlib")
+    assert serde.loads_typed((type_, data)) == payload
+
+def test_serializer_reads_legacy_rows():
+    """Checkpoints written before compression still load."""
+    payload = {"messages": ["renewable energy " * 100]}
+    legacy = JsonPlusSerializer().dumps_typed(payload)
+
+    assert ra.CompressedSerializer().loads_typed(legacy) == payload
@@ -1,57 +1,44 @@
-#!/usr/bin/env python3
-"""
-Test script to verify the research assistant structure and imports.
 """
+Tests verifying the research assistant structure and imports.
 
-def test_imports():
-    """Test that all imports work correctly."""
-    try:
-        import research_assistant
-        print("✅ SUCCESS: All imports work correctly")
-        return True
-    except Exception as e:
-        print(f"❌ FAILED: Import error - {e}")
-        return False
+Run with pytest; add ``-n auto`` when pytest-xdist is installed.
+"""
 
-def test_structure():
-    """Test that the code structure is valid."""
-    try:
-        import research_assistant
-        # Check if key components exist
-        assert hasattr(research_assistant, 'app'), "Missing compiled graph 'app'"
-        assert hasattr(research_assistant, 'main'), "Missing main function"
-        assert hasattr(research_assistant, 'web_search'), "Missing web_search tool"
-        assert hasattr(research_assistant, 'document_lookup'), "Missing document_lookup tool"
-        assert hasattr(research_assistant, 'calculate_stats'), "Missing calculate_stats tool"
-        assert hasattr(research_assistant, 'request_human_approval'), "Missing request_human_approval tool"
-        print("✅ SUCCESS: Code structure is valid")
-        return True
-    except Exception as e:
-        print(f"❌ FAILED: Structure error - {e}")
-        return False
+import ast
+from functools import lru_cache
+from pathlib import Path
 
-def main():
-    """Run all tests."""
-    print("🧪 Testing Research Assistant Structure...")
-    print("=" * 50)
-    
-    # Test imports
-    import_success = test_imports()
-    
-    # Test structure
-    structure_success = test_structure()
-    
-    print("=" * 50)
-    if import_success and structure_success:
-        print("🎉 ALL TESTS PASSED!")
-        print("✅ The research assistant code is structurally sound")
-        print("✅ All required components are present")
-        print("✅ LangGraph compilation works correctly")
-    else:
-        print("❌ SOME TESTS FAILED!")
+import pytest
 
-if __name__ == "__main__":
-    main()
+SOURCE = Path(__file__).with_name("research_assistant.py")
 
+@lru_cache(maxsize=1)
+def _top_level_names():
+    """Collect the names research_assistant.py defines at top level."""
+    # Parse rather than import, so checking structure doesn't build the graph
+    tree = ast.parse(SOURCE.read_text(encoding="utf-8"))
+    names = set()
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names.add(node.name)
+        elif isinstance(node, ast.Assign):
+            names.update(target.id for target in node.targets if isinstance(target, ast.Name))
+        elif isinstance(node, ast.AnnAssign) and isinstance(node.target, ast.Name):
+            names.add(node.target.id)
+    return frozenset(names)
 
+def test_imports(app):
+    """Test that all imports work correctly."""
+    assert app is not None
 
+@pytest.mark.parametrize("name, description", [
+    ("app", "compiled graph"),
+    ("main", "main function"),
+    ("web_search", "web_search tool"),
+    ("document_lookup", "document_lookup tool"),
+    ("calculate_stats", "calculate_stats tool"),
+    ("request_human_approval", "request_human_approval tool"),
+])
+def test_structure(name, description):
+    """Test that the key components exist."""
+    assert name in _top_level_names(), f"Missing {description} '{name}'"